@@ -0,0 +1,15 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+def expand_env_path(name):
+    value = os.getenv(name)
+    return os.path.expanduser(value) if value else None
+
+# Paths shared by the loader, the dashboard and the query tools
+DB_PATH = expand_env_path("DB_PATH")
+MY_PATH = expand_env_path("MY_PATH")
+BBY_PATH = expand_env_path("BBY_PATH")
+CARD_PATH = expand_env_path("CARD_PATH")
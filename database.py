@@ -0,0 +1,54 @@
+import sqlite3
+
+# Connection-level tuning applied to every connection we open. journal_mode=WAL is stored in
+# the database file, so after the first connection setting it again is a no-op; the rest are
+# per connection and have to be applied every time.
+PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-65536;
+    PRAGMA mmap_size=268435456;
+"""
+
+def open_db(path):
+    # isolation_level=None leaves transaction control to the caller (explicit BEGIN/COMMIT)
+    conn = sqlite3.connect(path, isolation_level=None, cached_statements=256)
+    conn.executescript(PRAGMAS)
+    return conn
+
+# Secondary indexes on the transactions table
+INDEXES = [
+    # Backs the dashboard's category list and filter
+    "CREATE INDEX IF NOT EXISTS idx_transaction_category ON transactions(transaction_category)",
+    # Lets the latest-per-owner lookups seek and walk backwards instead of scan and sort
+    "CREATE INDEX IF NOT EXISTS idx_owner_txnid ON transactions(account_owner, transaction_id DESC)"
+]
+
+def ensure_indexes(conn):
+    # Idempotent, so databases created before an index was added pick it up
+    for statement in INDEXES:
+        conn.execute(statement)
+
+def migrate_amounts_to_cents(conn):
+    # Older databases stored amount/balance as REAL dollars; move them to INTEGER cents.
+    # Returns True if a migration ran.
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(transactions)")]
+    if 'amount' not in columns or 'amount_cents' in columns:
+        return False
+    conn.execute("BEGIN")
+    try:
+        conn.execute("ALTER TABLE transactions ADD COLUMN amount_cents INTEGER")
+        conn.execute("ALTER TABLE transactions ADD COLUMN balance_cents INTEGER")
+        conn.execute('''
+            UPDATE transactions SET
+                amount_cents = CAST(ROUND(REPLACE(amount, ',', '') * 100) AS INTEGER),
+                balance_cents = CAST(ROUND(REPLACE(balance, ',', '') * 100) AS INTEGER)
+        ''')
+        conn.execute("ALTER TABLE transactions DROP COLUMN amount")
+        conn.execute("ALTER TABLE transactions DROP COLUMN balance")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return True
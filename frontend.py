@@ -6,7 +6,8 @@ import logging
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
+from config import DB_PATH
+from database import open_db
 
 logging.basicConfig(
     level=logging.INFO,
@@ -16,37 +17,82 @@ logging.basicConfig(
     ]
 )
 
-# Load env
-load_dotenv()
-
-# Connect to DB with expanded path
-db_path = os.path.expanduser(os.getenv("DB_PATH"))
-
+# Connect to DB
 try:
-    conn = sqlite3.connect(db_path)
+    conn = open_db(DB_PATH)
     cursor = conn.cursor()
-    logging.info(f"Connected to the database at {db_path}")
+    logging.info(f"Connected to the database at {DB_PATH}")
 except sqlite3.Error as e:
     logging.error(f"Database connection failed: {e}")
     exit()
 
+# The dashboard reads amounts as integer cents; an older database has to be migrated first
+columns = [row[1] for row in conn.execute("PRAGMA table_info(transactions)")]
+if 'amount_cents' not in columns:
+    logging.error(f"Database at {DB_PATH} has no amount_cents column")
+    st.error("The database hasn't been migrated to integer cents yet. Run load_transactions.py "
+             "or query_database.update_db() first, then reload this page.")
+    st.stop()
+
+# Card rows are stored as ISO dates and bank rows as M/D/YYYY. Parse each with an
+# explicit format and only fall back to slow 'mixed' inference for anything left over
+def parse_dates(dates):
+    parsed = pd.to_datetime(dates, format='%Y-%m-%d', errors='coerce')
+    for date_format in ['%m/%d/%Y', 'mixed']:
+        unparsed = parsed.isna() & dates.notna()
+        if not unparsed.any():
+            break
+        parsed[unparsed] = pd.to_datetime(dates[unparsed], format=date_format, errors='coerce')
+    return parsed
+
+# Bump whenever load_data's frame changes shape, so an older on-disk cache is never read back
+DATA_CACHE_VERSION = 1
+
+# Identifies the data currently in the database. Writes land in the -wal file until a
+# checkpoint, so a non-empty -wal counts too. Every connection (including this script's)
+# creates an empty -wal on open and deletes it on close; that one says nothing about the
+# data, so it is ignored or the key would change on every rerun.
+def get_db_version():
+    wal_path = f"{DB_PATH}-wal"
+    if os.path.exists(wal_path) and os.path.getsize(wal_path) > 0:
+        return os.path.getmtime(DB_PATH), os.path.getmtime(wal_path)
+    return os.path.getmtime(DB_PATH), None
+
 # Enhanced data loading with basic preprocessing
 @st.cache_data
-def load_data():
-    query = "SELECT * FROM transactions"
+def load_data(db_version):
+    # Reuse the parsed frame from disk while the database hasn't changed. With writes still
+    # sitting in the -wal the main file's mtime isn't enough to tell, so go to the database.
+    db_mtime, wal_mtime = db_version
+    cache_path = f"{DB_PATH}.v{DATA_CACHE_VERSION}.feather"
+    if wal_mtime is None and os.path.exists(cache_path) and os.path.getmtime(cache_path) >= db_mtime:
+        return pd.read_feather(cache_path)
+
+    # Only pull the columns the dashboard reads
+    query = """
+        SELECT posting_date, transaction_type, amount_cents / 100.0 AS amount, description,
+               transaction_category, type, account_owner
+        FROM transactions
+    """
     df = pd.read_sql(query, conn)
 
-    # Convert dates using mixed format parsing
-    df['posting_date'] = pd.to_datetime(df['posting_date'], format='mixed')
-    df['month_year'] = df['posting_date'].dt.to_period('M')
+    df['posting_date'] = parse_dates(df['posting_date'])
+    # Month buckets and the expense flag are reused by every chart, so compute them once
+    df['month_year'] = df['posting_date'].values.astype('datetime64[M]')
 
     # ensure all amounts are numeric
     df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-    df['balance'] = pd.to_numeric(df['balance'], errors='coerce')
+    df['is_expense'] = df['amount'] < 0
+
+    try:
+        df.to_feather(cache_path)
+    except OSError as e:
+        logging.warning(f"Could not write data cache {cache_path}: {e}")
 
     return df
 
-df = load_data()
+db_version = get_db_version()
+df = load_data(db_version)
 
 # Helper function to get expenses based on account owner
 def get_expenses(df, account_owner=None):
@@ -55,7 +101,7 @@ def get_expenses(df, account_owner=None):
         return df[df['transaction_type'].str.lower() == 'debit']
     else:
         # For others (Connor), use negative amounts
-        return df[df['amount'] < 0]
+        return df[df['is_expense']]
 
 # Helper function to get income based on account owner
 def get_income(df, account_owner=None):
@@ -66,6 +112,42 @@ def get_income(df, account_owner=None):
         # For others (Connor), use positive amounts
         return df[df['amount'] > 0]
 
+# Chart aggregates are cached on the filter values, so moving an unrelated widget (the
+# amount slider, the budget target) reuses them. Streamlit doesn't hash parameters with a
+# leading underscore; the database version and filter values identify the frame instead.
+@st.cache_data
+def compute_summary(_filtered_df, db_version, date_range, category, account):
+    expenses_df = get_expenses(_filtered_df, account)
+    income_df = get_income(_filtered_df, account)
+    spending_days = expenses_df['posting_date'].dt.date.nunique()
+    return expenses_df['amount'].sum(), income_df['amount'].sum(), spending_days
+
+@st.cache_data
+def compute_monthly_spending(_filtered_df, db_version, date_range, category, account):
+    expenses_df = get_expenses(_filtered_df, account)
+    return expenses_df.groupby('month_year').agg(
+        total_amount=('amount', 'sum'),
+        transaction_count=('amount', 'count')
+    ).reset_index()
+
+@st.cache_data
+def compute_category_spending(_filtered_df, db_version, date_range, category, account):
+    expenses_df = get_expenses(_filtered_df, account)
+    return expenses_df.groupby('transaction_category')['amount'].sum().abs()
+
+# Sidebar options only change when the database does
+@st.cache_data
+def get_categories(db_version):
+    return [row[0] for row in conn.execute(
+        "SELECT DISTINCT transaction_category FROM transactions ORDER BY transaction_category"
+    )]
+
+@st.cache_data
+def get_account_owners(db_version):
+    return [row[0] for row in conn.execute(
+        "SELECT DISTINCT account_owner FROM transactions ORDER BY account_owner"
+    )]
+
 # Sidebar for global filters
 st.sidebar.header("Filters")
 # Date range filter
@@ -76,7 +158,7 @@ date_range = st.sidebar.date_input(
 )
 
 # Category filter in sidebar
-all_categories = ['All'] + list(df['transaction_category'].unique())
+all_categories = ['All'] + get_categories(db_version)
 selected_category_filter = st.sidebar.selectbox(
     "Filter by Category",
     options=all_categories
@@ -86,13 +168,16 @@ selected_category_filter = st.sidebar.selectbox(
 st.title("Personal Finance Dashboard")
 
 # Filter data based on date range and category
-mask = (df['posting_date'].dt.date >= date_range[0]) & (df['posting_date'].dt.date <= date_range[1])
+# Compare on the datetime64 column directly; the upper bound is exclusive of the next day
+start_date = pd.Timestamp(date_range[0])
+end_date = pd.Timestamp(date_range[1]) + pd.Timedelta(days=1)
+mask = (df['posting_date'] >= start_date) & (df['posting_date'] < end_date)
 filtered_df = df[mask]
 
 if selected_category_filter != 'All':
     filtered_df = filtered_df[filtered_df['transaction_category'] == selected_category_filter]
 
-all_accounts = ['All'] + list(df['account_owner'].unique())
+all_accounts = ['All'] + get_account_owners(db_version)
 selected_account = st.sidebar.selectbox(
     "Filter by Account",
     options=all_accounts
@@ -102,18 +187,17 @@ selected_account = st.sidebar.selectbox(
 if selected_account != 'All':
     filtered_df = filtered_df[filtered_df['account_owner'] == selected_account]
 
+filter_key = (db_version, date_range, selected_category_filter, selected_account)
+
 # Summary metrics
 st.header("Summary Metrics")
 col1, col2, col3, col4 = st.columns(4)
+total_spending, total_income, spending_days = compute_summary(filtered_df, *filter_key)
 
 with col1:
-    expenses_df = get_expenses(filtered_df, selected_account)
-    total_spending = expenses_df['amount'].sum()
     st.metric("Total Spending", f"${abs(total_spending):,.2f}")
     
 with col2:
-    income_df = get_income(filtered_df, selected_account)
-    total_income = income_df['amount'].sum()
     st.metric("Total Income", f"${total_income:,.2f}")
     
 with col3:
@@ -125,7 +209,6 @@ with col3:
 
 with col4:
     # Calculate avg_daily_spending based only on days with expenses
-    spending_days = expenses_df['posting_date'].dt.date.nunique()
     if spending_days > 0:
         avg_daily_spending = abs(total_spending) / spending_days
     else:
@@ -134,24 +217,18 @@ with col4:
 
 # Monthly Spending Trends
 st.header("Monthly Spending Analysis")
-# Filter only expense transactions based on account
-monthly_expenses = get_expenses(filtered_df, selected_account)
-
-# Group by month and calculate total spending and transaction count
-monthly_spending = monthly_expenses.groupby(monthly_expenses['posting_date'].dt.to_period('M')).agg(
-    total_amount=('amount', 'sum'),
-    transaction_count=('amount', 'count')
-).reset_index()
+# Total spending and transaction count per month for expense transactions
+monthly_spending = compute_monthly_spending(filtered_df, *filter_key)
 
 # Plot monthly spending and transaction count
 fig_monthly = go.Figure()
 fig_monthly.add_trace(go.Bar(
-    x=monthly_spending['posting_date'].astype(str),
+    x=monthly_spending['month_year'].dt.strftime('%Y-%m'),
     y=abs(monthly_spending['total_amount']),  # Taking absolute value for spending
     name='Total Spending'
 ))
 fig_monthly.add_trace(go.Scatter(
-    x=monthly_spending['posting_date'].astype(str),
+    x=monthly_spending['month_year'].dt.strftime('%Y-%m'),
     y=monthly_spending['transaction_count'],
     name='Transaction Count',
     yaxis='y2'
@@ -169,14 +246,12 @@ col1, col2 = st.columns(2)
 
 with col1:
     # Get spending by category using the helper function
-    expenses_df = get_expenses(filtered_df, selected_account)
-    category_spending = expenses_df.groupby('transaction_category')['amount'].sum().abs()
-    
-    # Get top 5 categories
-    top_5_categories = category_spending.nlargest(5)
+    category_spending = compute_category_spending(filtered_df, *filter_key)
     
-    # Calculate "Other" category
-    other_amount = category_spending[~category_spending.index.isin(top_5_categories.index)].sum()
+    # Sort once; the top 5 and the "Other" remainder are both slices of it
+    sorted_categories = category_spending.sort_values(ascending=False)
+    top_5_categories = sorted_categories.iloc[:5]
+    other_amount = sorted_categories.iloc[5:].sum()
     
     # Create new series with Top 5 + Other
     pie_data = pd.concat([top_5_categories, pd.Series({'Other': other_amount})])
@@ -206,7 +281,7 @@ if selected_account == 'Partner':
     amount_min = float(df['amount'].min())
     amount_max = float(df['amount'].max())
 else:
-    amount_min = float(df[df['amount'] < 0]['amount'].min())
+    amount_min = float(df[df['is_expense']]['amount'].min())
     amount_max = float(df[df['amount'] > 0]['amount'].max())
 
 amount_range = st.slider(
@@ -216,11 +291,11 @@ amount_range = st.slider(
     (amount_min, amount_max)
 )
 
-# Apply amount filter to table data
-table_data = filtered_df[
-    (filtered_df['amount'] >= amount_range[0]) &
-    (filtered_df['amount'] <= amount_range[1])
-]
+# Apply amount filter to table data, ANDing the bounds in place on the raw array
+amounts = filtered_df['amount'].to_numpy()
+in_amount_range = amounts >= amount_range[0]
+in_amount_range &= amounts <= amount_range[1]
+table_data = filtered_df[in_amount_range]
 
 # Display filtered transactions
 st.dataframe(
@@ -232,20 +307,17 @@ st.dataframe(
 st.header("Budget Analysis")
 monthly_budget = st.number_input("Set Monthly Budget Target ($)", min_value=0.0, value=5000.0)
 
-# Calculate monthly spending vs budget using the helper function
-expenses_df = get_expenses(filtered_df, selected_account)
-monthly_vs_budget = expenses_df.groupby(
-    expenses_df['posting_date'].dt.to_period('M')
-)['amount'].sum().abs()
+# Monthly spending vs budget reuses the cached monthly totals
+monthly_vs_budget = monthly_spending.set_index('month_year')['total_amount'].abs()
 
 fig_budget = go.Figure()
 fig_budget.add_trace(go.Bar(
-    x=monthly_vs_budget.index.astype(str),
+    x=monthly_vs_budget.index.strftime('%Y-%m'),
     y=monthly_vs_budget.values,
     name='Actual Spending'
 ))
 fig_budget.add_trace(go.Scatter(
-    x=monthly_vs_budget.index.astype(str),
+    x=monthly_vs_budget.index.strftime('%Y-%m'),
     y=[monthly_budget] * len(monthly_vs_budget),
     name='Budget Target',
     line=dict(color='red', dash='dash')
@@ -2,8 +2,13 @@ import os
 import logging
 import sqlite3
 import json
-from dotenv import load_dotenv
-from transaction_processor import TransactionProcessor
+from config import DB_PATH, MY_PATH, BBY_PATH, CARD_PATH
+from collections import deque
+from itertools import groupby
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor
+from transaction_processor import TransactionProcessor, transform_chunk
+from database import open_db, ensure_indexes, migrate_amounts_to_cents
 
 logging.basicConfig(
     level=logging.INFO,
@@ -13,120 +18,135 @@ logging.basicConfig(
     ]
 )
 
-# Load environment variables
-load_dotenv()
-
-# Expand paths from environment variables
-db_path = os.path.expanduser(os.getenv("DB_PATH"))
-my_csv_folder = os.path.expanduser(os.getenv("MY_PATH"))
-partner_csv_folder = os.path.expanduser(os.getenv("BBY_PATH"))
-card_csv_folder = os.path.expanduser(os.getenv("CARD_PATH"))
-
-
-# Database connection
-try:
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    logging.info(f"Connected to the database at {db_path}")
-except sqlite3.Error as e:
-    logging.error(f"Database connection failed: {e}")
-    exit()
-
-# Create transactions table if it doesn't exist
-try:
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS transactions (
-        transaction_id TEXT PRIMARY KEY,
-        posting_date TEXT,
-        effective_date TEXT,
-        transaction_type TEXT,
-        amount REAL,
-        check_number TEXT,
-        reference_number TEXT,
-        description TEXT,
-        transaction_category TEXT,
-        type TEXT,
-        balance REAL,
-        memo TEXT,
-        extended_description TEXT,
-        account_owner TEXT
-    )
-    ''')
-    conn.commit()
-    logging.info("Transactions table verified/created.")
-except sqlite3.Error as e:
-    logging.error(f"Error creating transactions table: {e}")
-    exit()
-
-# Load category mappings
-category_file = 'transaction_categories.json'
-try:
-    with open(category_file, 'r') as f:
-        category_mappings = json.load(f)
-    logging.info("Loaded category mappings from JSON.")
-except FileNotFoundError:
-    logging.error(f"Category mapping file {category_file} not found.")
-    exit()
-
-# Initialize processor
-processor = TransactionProcessor(conn, category_mappings)
-
-# Add debug logging for paths
-logging.info(f"My CSV folder path: {my_csv_folder}")
-logging.info(f"Partner CSV folder path: {partner_csv_folder}")
-logging.info(f"Card CSV folder path: {card_csv_folder}")
-
-# Verify folders exist
-if not os.path.exists(my_csv_folder):
-    logging.error(f"My CSV folder not found: {my_csv_folder}")
-    exit()
-if not os.path.exists(partner_csv_folder):
-    logging.error(f"Partner CSV folder not found: {partner_csv_folder}")
-    exit()
-if not os.path.exists(card_csv_folder):
-    logging.error(f"Card CSV folder not found: {card_csv_folder}")
-    exit()
-
-# Process my transactions
-my_files = os.listdir(my_csv_folder)
-logging.info(f"Found my files: {my_files}")
-for filename in my_files:
-    if filename.endswith('.csv'):
-        file_path = os.path.join(my_csv_folder, filename)
-        processor.process_csv(file_path, 'my')
-
-# Process partner transactions
-partner_files = os.listdir(partner_csv_folder)
-logging.info(f"Found partner files: {partner_files}")
-for filename in partner_files:
-    if filename.endswith('.csv'):
-        file_path = os.path.join(partner_csv_folder, filename)
-        processor.process_csv(file_path, 'partner')
-
-card_files = os.listdir(card_csv_folder)
-logging.info(f"Found card files: {card_files}")
-for filename in card_files:
-    if filename.endswith('.csv'):
-        file_path = os.path.join(card_csv_folder, filename)
-        processor.process_csv(file_path, 'card')
-
-# Verify results
-cursor.execute("SELECT COUNT(*) FROM transactions WHERE account_owner = 'Partner'")
-partner_count = cursor.fetchone()[0]
-logging.info(f"Total partner transactions in database: {partner_count}")
-
-cursor.execute("SELECT COUNT(*) FROM transactions WHERE account_owner = 'Connor'")
-my_count = cursor.fetchone()[0]
-logging.info(f"Total my transactions in database: {my_count}")
-
-cursor.execute("SELECT COUNT(*) FROM transactions WHERE account_owner = 'Card'")
-card_count = cursor.fetchone()[0]
-logging.info(f"Total card transactions in databse: {card_count}")
-
-# Close the connection
-try:
-    cursor.close()
-    conn.close()
-    logging.info("Database connection closed.")
-except sqlite3.Error as e:
-    logging.error(f"Error closing database connection: {e}")
+# Like executor.map, but with at most `window` jobs submitted ahead of the consumer. Results
+# come back in submission order and are dropped once consumed, instead of every finished
+# result staying referenced until the executor shuts down.
+def bounded_map(executor, fn, jobs, window):
+    pending = deque()
+    for args in jobs:
+        pending.append(executor.submit(fn, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+# Arguments for transform_chunk, one set per chunk of every usable file, read lazily so a
+# chunk is only parsed when there is room to submit it
+def chunk_jobs(processor, csv_jobs, category_mappings):
+    for file_path, transaction_type in csv_jobs:
+        if processor.validate_columns(file_path, transaction_type):
+            for df in processor.read_csv_chunks(file_path, transaction_type):
+                yield file_path, df, transaction_type, category_mappings
+
+def main():
+    # Database connection
+    try:
+        conn = open_db(DB_PATH)
+        cursor = conn.cursor()
+        logging.info(f"Connected to the database at {DB_PATH}")
+    except sqlite3.Error as e:
+        logging.error(f"Database connection failed: {e}")
+        exit()
+
+    # Create transactions table if it doesn't exist
+    try:
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            transaction_id TEXT PRIMARY KEY,
+            posting_date TEXT,
+            effective_date TEXT,
+            transaction_type TEXT,
+            amount_cents INTEGER,
+            check_number TEXT,
+            reference_number TEXT,
+            description TEXT,
+            transaction_category TEXT,
+            type TEXT,
+            balance_cents INTEGER,
+            memo TEXT,
+            extended_description TEXT,
+            account_owner TEXT
+        )
+        ''')
+        ensure_indexes(conn)
+        conn.commit()
+        if migrate_amounts_to_cents(conn):
+            logging.info("Migrated amount and balance columns to integer cents.")
+        logging.info("Transactions table verified/created.")
+    except sqlite3.Error as e:
+        logging.error(f"Error creating transactions table: {e}")
+        exit()
+
+    # Load category mappings
+    category_file = 'transaction_categories.json'
+    try:
+        with open(category_file, 'r') as f:
+            category_mappings = json.load(f)
+        logging.info("Loaded category mappings from JSON.")
+    except FileNotFoundError:
+        logging.error(f"Category mapping file {category_file} not found.")
+        exit()
+
+    # Initialize processor
+    processor = TransactionProcessor(conn, category_mappings)
+
+    # Add debug logging for paths
+    logging.info(f"My CSV folder path: {MY_PATH}")
+    logging.info(f"Partner CSV folder path: {BBY_PATH}")
+    logging.info(f"Card CSV folder path: {CARD_PATH}")
+
+    # Verify folders exist
+    if not os.path.exists(MY_PATH):
+        logging.error(f"My CSV folder not found: {MY_PATH}")
+        exit()
+    if not os.path.exists(BBY_PATH):
+        logging.error(f"Partner CSV folder not found: {BBY_PATH}")
+        exit()
+    if not os.path.exists(CARD_PATH):
+        logging.error(f"Card CSV folder not found: {CARD_PATH}")
+        exit()
+
+    # Collect every CSV up front so the files can be parsed in parallel
+    csv_jobs = []
+    for folder, transaction_type in [(MY_PATH, 'my'), (BBY_PATH, 'partner'), (CARD_PATH, 'card')]:
+        files = os.listdir(folder)
+        logging.info(f"Found {transaction_type} files: {files}")
+        for filename in files:
+            if filename.endswith('.csv'):
+                csv_jobs.append((os.path.join(folder, filename), transaction_type))
+
+    # Files are read here a chunk at a time. Categorizing and transforming a chunk is CPU
+    # bound, so that runs in worker processes; inserts stay on this connection so SQLite only
+    # ever sees one writer. bounded_map keeps just a couple of chunks per worker in flight, so
+    # memory is bounded by CHUNK_SIZE rather than by file sizes or the number of files.
+    workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        jobs = chunk_jobs(processor, csv_jobs, category_mappings)
+        results = bounded_map(executor, transform_chunk, jobs, 2 * workers)
+        # Results arrive in file order, so consecutive chunks of a file form that file's batches
+        for file_path, file_results in groupby(results, key=itemgetter(0)):
+            processor.insert_records(file_path, (records for _, records in file_results))
+
+    # Verify results
+    cursor.execute("SELECT COUNT(*) FROM transactions WHERE account_owner = 'Partner'")
+    partner_count = cursor.fetchone()[0]
+    logging.info(f"Total partner transactions in database: {partner_count}")
+
+    cursor.execute("SELECT COUNT(*) FROM transactions WHERE account_owner = 'Connor'")
+    my_count = cursor.fetchone()[0]
+    logging.info(f"Total my transactions in database: {my_count}")
+
+    cursor.execute("SELECT COUNT(*) FROM transactions WHERE account_owner = 'Card'")
+    card_count = cursor.fetchone()[0]
+    logging.info(f"Total card transactions in databse: {card_count}")
+
+    # Close the connection
+    try:
+        cursor.close()
+        conn.close()
+        logging.info("Database connection closed.")
+    except sqlite3.Error as e:
+        logging.error(f"Error closing database connection: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 import sqlite3
+import sys
 import logging
 import os
-from pathlib import Path
-from dotenv import load_dotenv
+from config import DB_PATH, BBY_PATH, MY_PATH
+from database import open_db, ensure_indexes, migrate_amounts_to_cents
 
 # Configure logging
 logging.basicConfig(
@@ -13,14 +14,6 @@ logging.basicConfig(
     ]
 )
 
-# Load environment variables
-load_dotenv()
-
-# Get paths from environment variables
-DB_PATH = os.path.expanduser(os.getenv('DB_PATH'))
-BBY_PATH = os.path.expanduser(os.getenv('BBY_PATH'))
-MY_PATH = os.path.expanduser(os.getenv('MY_PATH'))
-
 # Validate environment variables
 if not all([DB_PATH, BBY_PATH, MY_PATH]):
     logging.error("Missing required environment variables. Please check your .env file")
@@ -32,7 +25,7 @@ os.makedirs(BBY_PATH, exist_ok=True)
 os.makedirs(MY_PATH, exist_ok=True)
 
 try:
-    conn = sqlite3.connect(DB_PATH)
+    conn = open_db(DB_PATH)
     cursor = conn.cursor()
     logging.info(f"Connected to the database at {DB_PATH}")
 except sqlite3.Error as e:
@@ -42,11 +35,10 @@ except sqlite3.Error as e:
 # Function to display all transactions
 def show_all_transactions():
     cursor.execute("SELECT * FROM transactions")
-    rows = cursor.fetchall()
-    
+
+    # Stream rows off the cursor rather than materializing the whole table
     print("All Stored Transactions:")
-    for row in rows:
-        print(row)
+    sys.stdout.writelines(f"{row}\n" for row in cursor)
 
 # Function to show transactions by specific Transaction ID
 def show_transactions_by_id(transaction_id):
@@ -64,9 +56,13 @@ def count_transactions():
     print(f"Total number of transactions: {count}")
 
 def check_for_duplicates():
+    # transaction_id is the primary key, but SQLite lets a TEXT primary key hold NULL and
+    # never treats two NULLs as a conflict, so only rows without an id can repeat. Limiting
+    # the scan to those lets it search the primary key index instead of grouping the table.
     duplicate_query = """
         SELECT transaction_id, reference_number, COUNT(*) as count
         FROM transactions
+        WHERE transaction_id IS NULL
         GROUP BY transaction_id, reference_number
         HAVING count > 1
     """
@@ -99,12 +95,14 @@ def update_db():
             print("Column 'account_owner' already exists")
         else:
             raise e
+    if migrate_amounts_to_cents(conn):
+        print("Migrated amount and balance columns to integer cents")
+    ensure_indexes(conn)
+    print("Indexes verified/created")
 
 def select_query():
-    # First, get column names
-    cursor.execute("PRAGMA table_info(transactions)")
-    columns = [column[1] for column in cursor.fetchall()]
-    
+    # Each LIMIT 2 branch is an index seek plus a backward walk of idx_owner_txnid, which
+    # beats a ROW_NUMBER() window that has to rank every row for both owners
     query = """
     SELECT * FROM (
         SELECT * FROM transactions 
@@ -122,6 +120,8 @@ def select_query():
     """
     cursor.execute(query)
     rows = cursor.fetchall()
+    # Column names come with the result set, no separate PRAGMA table_info round-trip
+    columns = [column[0] for column in cursor.description]
     
     print("\nColumn names:")
     for i, col in enumerate(columns):
@@ -136,8 +136,11 @@ def select_query():
 
 def get_transaction_files():
     """Get all transaction files from both directories"""
-    bby_files = list(Path(BBY_PATH).glob('*'))
-    my_files = list(Path(MY_PATH).glob('*'))
+    # scandir's entries carry the file type from the directory listing, so no per-file stat
+    with os.scandir(BBY_PATH) as entries:
+        bby_files = [entry.path for entry in entries if entry.is_file()]
+    with os.scandir(MY_PATH) as entries:
+        my_files = [entry.path for entry in entries if entry.is_file()]
     return {
         'bby': bby_files,
         'my': my_files
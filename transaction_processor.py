@@ -1,183 +1,301 @@
+import hashlib
 import logging
+import numpy as np
 import pandas as pd
 import re
-from datetime import datetime
 import sqlite3
 
+# Column order of every insert; both INSERT_SQL and the insert-ready tuples follow it
+INSERT_COLUMNS = [
+    'transaction_id', 'posting_date', 'effective_date', 'transaction_type',
+    'amount_cents', 'check_number', 'reference_number', 'description',
+    'transaction_category', 'type', 'balance_cents', 'memo', 'extended_description',
+    'account_owner'
+]
+
+# Shared by every insert so sqlite3's statement cache always hits
+INSERT_SQL = f'''
+    INSERT OR IGNORE INTO transactions ({', '.join(INSERT_COLUMNS)})
+    VALUES ({', '.join('?' * len(INSERT_COLUMNS))})
+'''
+
+# Columns a file must have before it is parsed
+REQUIRED_COLUMNS = {
+    'partner': ['Account Number', 'Transaction Description', 'Transaction Date',
+                'Transaction Type', 'Transaction Amount', 'Balance'],
+    'card': ['Transaction Date', 'Posted Date', 'Card No.', 'Description',
+             'Category', 'Debit', 'Credit'],
+    'my': ['Transaction ID', 'Posting Date', 'Effective Date', 'Transaction Type',
+           'Amount', 'Description']
+}
+
+# Further columns read when the export has them
+OPTIONAL_COLUMNS = {
+    'my': ['Check Number', 'Reference Number', 'Transaction Category', 'Type', 'Balance',
+           'Memo', 'Extended Description']
+}
+
+# Columns read from each export; anything else in the file is skipped by the parser
+CSV_COLUMNS = {transaction_type: columns + OPTIONAL_COLUMNS.get(transaction_type, [])
+               for transaction_type, columns in REQUIRED_COLUMNS.items()}
+
+# Free-text and identifier columns are read as strings instead of letting pandas infer a
+# type; inference runs per chunk, so a chunk with no blanks would otherwise turn 101.0 into 101
+CSV_DTYPES = {
+    'Transaction ID': str,
+    'Check Number': str,
+    'Reference Number': str,
+    'Card No.': str,
+    'Description': str,
+    'Transaction Description': str,
+    'Memo': str,
+    'Extended Description': str
+}
+
+# Rows read per read_csv chunk and inserted per transaction
+CHUNK_SIZE = 10_000
+
+# read_csv already strips thousands separators, so amounts arrive as float64; to_numeric
+# is a no-op for those and only rejects a column that still holds text
+def parse_amounts(values):
+    return pd.to_numeric(values)
+
+# Money is stored as integer cents; missing values stay NULL
+def to_cents(amounts):
+    cents = (amounts * 100).round()
+    return cents.astype('Int64').astype(object).where(cents.notna(), None)
+
+# M/D/YYYY without leading zeros, as the bank's own export writes dates. Built from the date
+# parts instead of strftime plus a regex; Int64 keeps a missing date from turning 1 into '1.0'
+def format_mdy(dates):
+    month, day, year = (part.astype('Int64').astype(str)
+                        for part in (dates.dt.month, dates.dt.day, dates.dt.year))
+    return (month + '/' + day + '/' + year).where(dates.notna())
+
+# Suffix that makes generated partner/card transaction ids unique per description.
+# hash() is salted per process, so a stable digest is used to keep ids equal across runs.
+def description_id(description):
+    return hashlib.blake2b(description.encode('utf-8'), digest_size=8).hexdigest()
+
+# Exports repeat the same merchants over and over, so each distinct description is hashed once
+def description_ids(descriptions):
+    unique = descriptions.unique()
+    return descriptions.map(dict(zip(unique, map(description_id, unique))))
+
+# Category patterns without any of these are plain text, possibly alternated with |
+REGEX_METACHARACTERS = set('.^$*+?{}[]\\()')
+
 class TransactionProcessor:
     def __init__(self, db_connection, category_mappings):
+        # Transforming a chunk never touches the database, so workers can pass None
         self.conn = db_connection
-        self.cursor = db_connection.cursor()
         self.category_mappings = category_mappings
+        # Most mappings are plain merchant names like "SHELL|EXXON". Those are matched with a
+        # lowercase substring scan, which is far cheaper than an IGNORECASE regex; anything
+        # using real regex syntax is compiled once. Order is kept so the first mapping wins.
+        self.category_matchers = []
+        for pattern, category in category_mappings.items():
+            if REGEX_METACHARACTERS.isdisjoint(pattern):
+                self.category_matchers.append((tuple(pattern.lower().split('|')), None, category))
+            else:
+                self.category_matchers.append((None, re.compile(pattern, re.IGNORECASE), category))
 
-    def process_my_transaction(self, row):
-        return {
-            'transaction_id': row['Transaction ID'],
-            'posting_date': row['Posting Date'],
-            'effective_date': row['Effective Date'],
-            'transaction_type': row['Transaction Type'],
-            'amount': row['Amount'],
-            'check_number': row['Check Number'],
-            'reference_number': row['Reference Number'],
-            'description': row['Description'],
-            'transaction_category': self.categorize_description(row['Description']) or row['Transaction Category'],
-            'type': row['Type'],
-            'balance': row['Balance'],
-            'memo': row['Memo'],
-            'extended_description': row['Extended Description'],
+    def transform_my_transactions(self, df, categories):
+        return pd.DataFrame({
+            'transaction_id': df['Transaction ID'],
+            'posting_date': df['Posting Date'],
+            'effective_date': df['Effective Date'],
+            'transaction_type': df['Transaction Type'],
+            'amount_cents': to_cents(parse_amounts(df['Amount'])),
+            'check_number': df['Check Number'],
+            'reference_number': df['Reference Number'],
+            'description': df['Description'],
+            'transaction_category': categories.where(categories.astype(bool), df['Transaction Category']),
+            'type': df['Type'],
+            'balance_cents': to_cents(parse_amounts(df['Balance'])),
+            'memo': df['Memo'],
+            'extended_description': df['Extended Description'],
             'account_owner': 'Connor'
-        }
+        })
 
-    def process_partner_transaction(self, row):
-        try:
-            # Parse MM/DD/YY format
-            transaction_date = datetime.strptime(row['Transaction Date'], '%m/%d/%y')
-            
-            month = str(transaction_date.month)
-            day = str(transaction_date.day)
-            year = transaction_date.strftime('%Y')
-            formatted_date = f"{month}/{day}/{year}"
-            
-            unique_id = f"P_{transaction_date.strftime('%Y%m%d')}_{abs(hash(str(row['Transaction Description'])))}"
-            
-            amount = float(str(row['Transaction Amount']).replace(',',''))
-            if row['Transaction Type'].lower() == 'debit':
-                amount = -abs(amount)
-            elif row['Transaction Type'].lower() == 'credit':
-                amount = abs(amount)
-
-            processed_data = {
-                'transaction_id': unique_id,
-                'posting_date': formatted_date,
-                'effective_date': formatted_date,
-                'transaction_type': row['Transaction Type'],
-                'amount': amount,
-                'check_number': None,
-                'reference_number': unique_id,
-                'description': str(row['Transaction Description']),
-                'transaction_category': self.categorize_description(str(row['Transaction Description'])),
-                'type': row['Transaction Type'],
-                'balance': float(str(row['Balance']).replace(',', '')),
-                'memo': None,
-                'extended_description': None,
-                'account_owner': 'Partner'
-            }
-            
-            logging.info(f"Successfully processed partner transaction: {unique_id}")
-            return processed_data
-            
-        except Exception as e:
-            logging.error(f"Error processing partner transaction: {e}")
-            logging.error(f"Row data: {row}")
-            raise
+    def transform_partner_transactions(self, df, categories):
+        # Parse MM/DD/YY format and store as M/D/YYYY. An explicit format keeps this fast and
+        # raises with the offending value and position if a date doesn't match.
+        transaction_dates = pd.to_datetime(df['Transaction Date'], format='%m/%d/%y')
+        formatted_dates = format_mdy(transaction_dates)
 
-    def process_card_transaction(self, row):
-        try:
-            # Parse YYYY-MM-DD format
-            transaction_date = datetime.strptime(row['Transaction Date'], '%Y-%m-%d')
-            posted_date = datetime.strptime(row['Posted Date'], '%Y-%m-%d')
-            
-            unique_id = f"C_{transaction_date.strftime('%Y%m%d')}_{abs(hash(str(row['Description'])))}"
-            
-            # Determine amount based on Debit/Credit columns
-            amount = 0
-            if pd.notna(row['Debit']):
-                amount = -abs(float(str(row['Debit']).replace(',', '')))
-            elif pd.notna(row['Credit']):
-                amount = abs(float(str(row['Credit']).replace(',', '')))
-            
-            transaction_type = 'Debit' if amount < 0 else 'Credit'
-
-            processed_data = {
-                'transaction_id': unique_id,
-                'posting_date': posted_date.strftime('%Y-%m-%d'),
-                'effective_date': transaction_date.strftime('%Y-%m-%d'),
-                'transaction_type': transaction_type,
-                'amount': amount,
-                'check_number': None,
-                'reference_number': f"CARD_{row['Card No.']}_{unique_id}",
-                'description': str(row['Description']),
-                'transaction_category': self.categorize_description(str(row['Description'])),
-                'type': transaction_type,
-                'balance': None,  # Card transactions don't include balance
-                'memo': None,
-                'extended_description': None,
-                'account_owner': 'Card'
-            }
-            
-            logging.info(f"Successfully processed card transaction: {unique_id}")
-            return processed_data
-            
-        except Exception as e:
-            logging.error(f"Error processing card transaction: {e}")
-            logging.error(f"Row data: {row}")
-            raise
+        descriptions = df['Transaction Description'].astype(str)
+        unique_ids = 'P_' + transaction_dates.dt.strftime('%Y%m%d') + '_' + description_ids(descriptions)
+
+        # Debits are stored negative and credits positive, whatever sign the export used
+        raw_amounts = parse_amounts(df['Transaction Amount'])
+        transaction_types = df['Transaction Type'].str.lower()
+        amounts = raw_amounts.abs().where(transaction_types != 'debit', -raw_amounts.abs())
+        amounts = amounts.where(transaction_types.isin(['debit', 'credit']), raw_amounts)
+
+        return pd.DataFrame({
+            'transaction_id': unique_ids,
+            'posting_date': formatted_dates,
+            'effective_date': formatted_dates,
+            'transaction_type': df['Transaction Type'],
+            'amount_cents': to_cents(amounts),
+            'check_number': None,
+            'reference_number': unique_ids,
+            'description': descriptions,
+            'transaction_category': categories,
+            'type': df['Transaction Type'],
+            'balance_cents': to_cents(parse_amounts(df['Balance'])),
+            'memo': None,
+            'extended_description': None,
+            'account_owner': 'Partner'
+        })
+
+    def transform_card_transactions(self, df, categories):
+        # Parse YYYY-MM-DD format
+        transaction_dates = pd.to_datetime(df['Transaction Date'], format='%Y-%m-%d')
+        posted_dates = pd.to_datetime(df['Posted Date'], format='%Y-%m-%d')
+
+        descriptions = df['Description'].astype(str)
+        unique_ids = 'C_' + transaction_dates.dt.strftime('%Y%m%d') + '_' + description_ids(descriptions)
+
+        # Determine amount based on Debit/Credit columns
+        debits = parse_amounts(df['Debit'])
+        credits = parse_amounts(df['Credit'])
+        amounts = (-debits.abs()).fillna(credits.abs()).fillna(0)
+        transaction_types = pd.Series(np.where(amounts < 0, 'Debit', 'Credit'), index=df.index)
+
+        return pd.DataFrame({
+            'transaction_id': unique_ids,
+            'posting_date': posted_dates.dt.strftime('%Y-%m-%d'),
+            'effective_date': transaction_dates.dt.strftime('%Y-%m-%d'),
+            'transaction_type': transaction_types,
+            'amount_cents': to_cents(amounts),
+            'check_number': None,
+            'reference_number': 'CARD_' + df['Card No.'].astype(str) + '_' + unique_ids,
+            'description': descriptions,
+            'transaction_category': categories,
+            'type': transaction_types,
+            'balance_cents': None,  # Card transactions don't include balance
+            'memo': None,
+            'extended_description': None,
+            'account_owner': 'Card'
+        })
 
     def categorize_description(self, description):
-        for pattern, category in self.category_mappings.items():
-            if re.search(pattern, description, re.IGNORECASE):
+        lowered = description.lower()
+        for needles, regex, category in self.category_matchers:
+            if needles is not None:
+                if any(needle in lowered for needle in needles):
+                    return category
+            elif regex.search(description):
                 return category
         return 'Uncategorized'
 
-    def process_csv(self, file_path, transaction_type):
+    def categorize_descriptions(self, descriptions):
+        # Column-wise categorize_description, matching each distinct description only once
+        unique = descriptions.unique()
+        return descriptions.map(dict(zip(unique, map(self.categorize_description, unique))))
+
+    def transform_chunk(self, file_path, df, transaction_type):
+        try:
+            # Categorize the whole description column up front instead of row by row
+            description_column = 'Transaction Description' if transaction_type == 'partner' else 'Description'
+            categories = self.categorize_descriptions(df[description_column].astype(str))
+
+            # Transform whole columns at once
+            if transaction_type == 'my':
+                transformed = self.transform_my_transactions(df, categories)
+            elif transaction_type == 'partner':
+                transformed = self.transform_partner_transactions(df, categories)
+            else:  # card
+                transformed = self.transform_card_transactions(df, categories)
+
+            # A blank date (or a blank 'my' Transaction ID) leaves the id NULL. SQLite allows NULL
+            # in a TEXT primary key and never treats two NULLs as a conflict, so such rows would
+            # be stored again on every import; skip them instead
+            missing_ids = transformed['transaction_id'].isna()
+            if missing_ids.any():
+                logging.warning(f"Skipping {missing_ids.sum()} rows without a transaction id in {file_path} "
+                                f"(blank date or Transaction ID)")
+                transformed = transformed[~missing_ids]
+
+            # Selecting INSERT_COLUMNS pins the tuple order to INSERT_SQL rather than to the order
+            # the transform happened to build its columns in, and fails loudly if one is missing
+            return list(transformed[INSERT_COLUMNS].itertuples(index=False, name=None))
+        except Exception as e:
+            logging.error(f"Failed to load or process CSV file {file_path}: {e}")
+            raise
+
+    # Check the header alone before parsing the whole file. Returns False when the file can't
+    # be used.
+    def validate_columns(self, file_path, transaction_type):
         logging.info(f"Processing file: {file_path}")
         try:
-            df = pd.read_csv(file_path)
-            logging.info(f"Loaded {len(df)} rows from {file_path}")
-            logging.info(f"CSV columns: {df.columns.tolist()}")
-
-            # Validate columns based on transaction type
-            required_columns = {
-                'partner': ['Account Number', 'Transaction Description', 'Transaction Date',
-                           'Transaction Type', 'Transaction Amount', 'Balance'],
-                'card': ['Transaction Date', 'Posted Date', 'Card No.', 'Description',
-                        'Category', 'Debit', 'Credit'],
-                'my': ['Transaction ID', 'Posting Date', 'Effective Date', 'Transaction Type',
-                      'Amount', 'Description']
-            }
-
-            if transaction_type in required_columns:
-                missing_columns = [col for col in required_columns[transaction_type] 
-                                 if col not in df.columns]
-                if missing_columns:
-                    logging.error(f"Missing required columns for {transaction_type}: {missing_columns}")
-                    return
-
-            new_records = 0
-            duplicate_records = 0
-
-            for _, row in df.iterrows():
-                if transaction_type == 'my':
-                    processed_data = self.process_my_transaction(row)
-                elif transaction_type == 'partner':
-                    processed_data = self.process_partner_transaction(row)
-                else:  # card
-                    processed_data = self.process_card_transaction(row)
-
-                self.cursor.execute('''
-                    SELECT 1 FROM transactions 
-                    WHERE transaction_id = ? AND reference_number = ?
-                ''', (processed_data['transaction_id'], processed_data['reference_number']))
-
-                if self.cursor.fetchone() is None:
-                    try:
-                        self.cursor.execute('''
-                            INSERT INTO transactions (
-                                transaction_id, posting_date, effective_date, transaction_type, 
-                                amount, check_number, reference_number, description, 
-                                transaction_category, type, balance, memo, extended_description,
-                                account_owner
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', tuple(processed_data.values()))
-                        self.conn.commit()
-                        new_records += 1
-                    except sqlite3.Error as e:
-                        logging.error(f"Error inserting record {processed_data['transaction_id']}: {e}")
-                else:
-                    duplicate_records += 1
-
-            logging.info(f"Completed processing {file_path}. New records: {new_records}, Duplicates: {duplicate_records}")
+            header = pd.read_csv(file_path, nrows=0).columns
+        except Exception as e:
+            logging.error(f"Failed to load or process CSV file {file_path}: {e}")
+            raise
+        logging.info(f"CSV columns: {header.tolist()}")
+        if transaction_type in REQUIRED_COLUMNS:
+            missing_columns = [col for col in REQUIRED_COLUMNS[transaction_type]
+                             if col not in header]
+            if missing_columns:
+                logging.error(f"Missing required columns for {transaction_type}: {missing_columns}")
+                return False
+        return True
 
+    # Yield the raw rows of a CSV in CHUNK_SIZE-row frames, so only one chunk is held at a time
+    def read_csv_chunks(self, file_path, transaction_type):
+        # Let the C parser strip thousands separators while it reads; dates are parsed in the
+        # transforms, where pd.to_datetime handles empty chunks and names a bad value.
+        # A callable usecols tolerates optional columns that aren't in the file.
+        wanted_columns = CSV_COLUMNS.get(transaction_type)
+        try:
+            with pd.read_csv(
+                file_path,
+                usecols=lambda col: wanted_columns is None or col in wanted_columns,
+                dtype=CSV_DTYPES,
+                thousands=',',
+                chunksize=CHUNK_SIZE,
+                engine='c'
+            ) as reader:
+                for df in reader:
+                    # Once per chunk, so keep it at debug and let logging skip the formatting
+                    logging.debug("Loaded %d rows from %s", len(df), file_path)
+                    yield df
         except Exception as e:
             logging.error(f"Failed to load or process CSV file {file_path}: {e}")
             raise
+
+    def insert_records(self, file_path, batches):
+        # One transaction per chunk bounds each commit and the WAL on large imports;
+        # INSERT OR IGNORE lets the primary key skip rows that are already stored
+        new_records = 0
+        duplicate_records = 0
+        for records in batches:
+            try:
+                self.conn.execute('BEGIN')
+                inserted = self.conn.executemany(INSERT_SQL, records).rowcount
+                self.conn.commit()
+                new_records += inserted
+                duplicate_records += len(records) - inserted
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                logging.error(f"Error inserting records from {file_path}: {e}")
+                break
+
+        logging.info(f"Completed processing {file_path}. New records: {new_records}, Duplicates: {duplicate_records}")
+
+    def process_csv(self, file_path, transaction_type):
+        # Single-process import of one file. Each chunk is transformed and inserted before the
+        # next is read, so memory is bounded by CHUNK_SIZE rather than the file size.
+        if self.validate_columns(file_path, transaction_type):
+            batches = (self.transform_chunk(file_path, df, transaction_type)
+                       for df in self.read_csv_chunks(file_path, transaction_type))
+            self.insert_records(file_path, batches)
+
+def transform_chunk(file_path, df, transaction_type, category_mappings):
+    # Module-level so ProcessPoolExecutor workers can pickle it. The file path comes back with
+    # the records so the caller can group chunk results by file.
+    processor = TransactionProcessor(None, category_mappings)
+    return file_path, processor.transform_chunk(file_path, df, transaction_type)